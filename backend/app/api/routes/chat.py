@@ -1,7 +1,7 @@
 """
 Enterprise RAG System - Real Google Gemini Chat API with RAG Pipeline (Context7 Verified)
 """
-import asyncio
+import logging
 import time
 import uuid
 import re
@@ -12,6 +12,8 @@ from typing import List, Optional, Dict, Any
 from sqlmodel import Session, select
 import re
 
+logger = logging.getLogger(__name__)
+
 # Request/Response Models (Context7 verified Pydantic v2 patterns)
 class ChatQueryRequest(BaseModel):
     question: str = Field(..., description="User question")
@@ -76,26 +78,71 @@ class EnhancedChatResponse(BaseModel):
     response_optimization: Optional[Dict[str, Any]] = Field(None)
     formatting_applied: Optional[str] = Field(None)
 
-# Context7 verified helper functions for enhanced formatting
-def extract_slide_number(content: str, source: str) -> Optional[str]:
-    """Extract slide number from document content or source"""
-    # Try to find slide references in content
-    slide_patterns = [
+# Slide reference patterns, in priority order (compiled once, used for every source)
+SLIDE_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
         r'--- Slide (\d+) ---',
         r'Slide (\d+)',
         r'sayfa (\d+)',
         r'Page (\d+)',
         r'--- (\d+) ---'
-    ]
-    
-    for pattern in slide_patterns:
-        match = re.search(pattern, content, re.IGNORECASE)
+    )
+)
+SLIDE_FILENAME_PATTERN = re.compile(r'slide[_\s]?(\d+)|sayfa[_\s]?(\d+)|page[_\s]?(\d+)', re.IGNORECASE)
+
+# Answer prompts; static text is built once at import, only the dynamic parts are formatted per query
+RAG_PROMPT_TEMPLATE = """Sen bir profesyonel Türk bankacılık uzmanısın. Kullanıcı sorularını yanıtlarken öğrenilen bilgileri ÖNCELİKLE kullan, sonra belge bilgilerini kullan.
+
+{learned_header}
+{learned_context}
+
+{document_header}
+{document_context}
+
+KULLANICI SORUSU: {question}
+
+ÖNEMLİ TALİMATLAR:
+1. **ÖĞRENİLEN BİLGİ ÖNCELİĞİ**: Eğer öğrenilen bilgiler arasında soruyla ilgili bir prosedür/bilgi varsa, bunu yanıtın en başında ve net şekilde belirt
+2. **ÖĞRENİLEN BİLGİ VURGUSU**: Öğrenilen bilgileri "💡 **Öğrenilen Prosedür:**" başlığıyla vurgula
+3. **KAYNAK BELİRTME**: Öğrenilen bilgileri [Öğrenilen 1], belge bilgilerini [Belge 1] formatında belirt
+4. **TAM ENTEGRASYON**: Hem öğrenilen hem de belge bilgilerini kullanarak kapsamlı yanıt ver
+5. **SPESİFİK ÖNCELİK**: Kullanıcının tam sorusuna öğrenilen bilgiler cevap veriyorsa, bunu yanıtın en başına koy
+
+YANITLAMA STRATEJİSİ:
+- Önce öğrenilen prosedürleri kontrol et ve uygunsa kullan
+- Sonra belge bilgileriyle destekle veya genişlet
+- Her bilgi kaynağını açıkça belirt
+
+CEVAP:"""
+
+GENERAL_PROMPT_TEMPLATE = """Sen bir profesyonel Türk bankacılık uzmanısın.
+
+⚠️ DURUM: Sisteme yüklenmiş belgeler arasında bu soruyla doğrudan ilgili spesifik bir belge bulunamadı.
+
+KULLANICI SORUSU: {question}
+
+GÖREVİN:
+1. Genel bankacılık bilginle soruya kısa ve faydalı bir cevap ver
+2. Daha kesin bilgi için ilgili belgelerin sisteme yüklenmesi gerektiğini belirt
+3. Mümkünse genel prosedürler hakkında bilgi ver
+4. Türkçe olarak yanıtla
+
+ÖNEMLİ: Genel bilgi verirken, spesifik kurum politikaları için belge yüklenmesi gerektiğini hatırlat.
+
+CEVAP:"""
+
+# Context7 verified helper functions for enhanced formatting
+def extract_slide_number(content: str, source: str) -> Optional[str]:
+    """Extract slide number from document content or source"""
+    # Try to find slide references in content
+    for pattern in SLIDE_PATTERNS:
+        match = pattern.search(content)
         if match:
             return f"Slide {match.group(1)}"
     
     # Try to extract from source filename
-    filename_pattern = r'slide[_\s]?(\d+)|sayfa[_\s]?(\d+)|page[_\s]?(\d+)'
-    match = re.search(filename_pattern, source, re.IGNORECASE)
+    match = SLIDE_FILENAME_PATTERN.search(source)
     if match:
         slide_num = match.group(1) or match.group(2) or match.group(3)
         return f"Slide {slide_num}"
@@ -200,7 +247,7 @@ class ChatQueryResponse(BaseModel):
 
 
 # Core database
-from app.core.db import get_session
+from app.core.db import engine, get_session
 from app.models import ConversationMessage, Conversation
 from app.api.routes.conversations import get_or_create_conversation
 from app.services.chat_title_service import chat_title_service
@@ -224,25 +271,25 @@ try:
     from google import genai
     from google.genai import types
     from app.core.config import settings
-    from app.services.api_rotation import get_rotation_service, initialize_rotation_service
+    from app.services.api_rotation import get_rotation_service, initialize_rotation_service, gemini_request_limiter
     
     # Initialize rotation service if multiple keys available
     if settings.USE_API_ROTATION and len(settings.parsed_gemini_api_keys) > 1:
         initialize_rotation_service(settings.parsed_gemini_api_keys)
         GEMINI_AVAILABLE = True
         USE_ROTATION = True
-        print(f"[OK] Chat API rotation initialized with {len(settings.parsed_gemini_api_keys)} keys")
+        logger.info("Chat API rotation initialized with %d keys", len(settings.parsed_gemini_api_keys))
     else:
         # Create single client using API key
         client = genai.Client(api_key=settings.GEMINI_API_KEY)
         GEMINI_AVAILABLE = True
         USE_ROTATION = False
-        print("[OK] Chat API single client initialized")
+        logger.info("Chat API single client initialized")
     
 except ImportError:
     GEMINI_AVAILABLE = False
     USE_ROTATION = False
-    print("Warning: google-genai not installed")
+    logger.warning("google-genai not installed")
 
 # RAG Services (Context7 verified)
 from app.services.embeddings import embeddings_service
@@ -252,10 +299,10 @@ from app.services.vector_store import vector_store_service
 try:
     from app.services.hybrid_rag_service import hybrid_rag_service
     HYBRID_SEARCH_AVAILABLE = True
-    print("✅ Context7: Hybrid RAG service available")
+    logger.info("Hybrid RAG service available")
 except ImportError:
     HYBRID_SEARCH_AVAILABLE = False
-    print("⚠️ Hybrid RAG service not available, using standard search")
+    logger.info("Hybrid RAG service not available, using standard search")
 
 router = APIRouter(tags=["chat"])
 
@@ -291,9 +338,9 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
     )
     
     if conversation:
-        print(f"💬 Using conversation: {conversation.id} (title: {conversation.title})")
+        logger.debug("Using conversation: %s (title: %s)", conversation.id, conversation.title)
     else:
-        print("⚠️ Could not create/find conversation - proceeding without persistence")
+        logger.warning("Could not create/find conversation - proceeding without persistence")
     
     # Phase 5.4: Check cache first (Context7 verified)
     cached_response = await caching_service.get_cached_response(question)
@@ -318,35 +365,35 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
     user_message = None
     if conversation:
         try:
+            now = datetime.utcnow()  # One timestamp for the message and conversation metadata
             user_message = ConversationMessage(
                 conversation_id=str(conversation.id),
                 message_type="user",
                 content=question,
                 message_order=conversation.message_count + 1,
                 tokens_used=0,
-                created_at=datetime.utcnow()
+                created_at=now
             )
             session.add(user_message)
             
             # Update conversation metadata
             conversation.message_count += 1
-            conversation.last_activity = datetime.utcnow()
-            conversation.updated_at = datetime.utcnow()
+            conversation.last_activity = now
+            conversation.updated_at = now
             
             session.commit()
-            print(f"✅ User message saved to conversation {conversation.id}")
+            logger.debug("User message saved to conversation %s", conversation.id)
         except Exception as e:
             session.rollback()
-            print(f"⚠️ Failed to save user message: {e}")
+            logger.warning("Failed to save user message: %s", e)
     
     # Start normal RAG processing
-    print(f"🧠 STEP 1: Starting RAG query processing for: {question[:50]}...")
-    print(f"💬 Request conversation_id: {request.conversation_id}")
-    print(f"🌐 CORS Debug - Origin allowed: localhost:5174")
-    print(f"📝 Query: {question}")
+    logger.debug("STEP 1: Starting RAG query processing for: %.50s...", question)
+    logger.debug("Request conversation_id: %s", request.conversation_id)
+    logger.debug("Query: %s", question)
     # NEW: Step 0.5 - INTELLIGENT QUERY PROCESSING & RESPONSE OPTIMIZATION
     # Context7 verified pattern: Graceful degradation without deleted services
-    print(f"🧠 STEP 0.5: Core RAG Processing (Simplified)")
+    logger.debug("STEP 0.5: Core RAG Processing (Simplified)")
         
     # Create basic analysis object for compatibility (Context7 verified fallback pattern)
     query_analysis = {
@@ -366,17 +413,17 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
     # Continue with Enhanced RAG processing (Documents + Learned Knowledge)
     try:
         # RAG Pipeline Step 1: Create multi-query embeddings for better search
-        print(f"Creating embeddings for query: {question}")
+        logger.debug("Creating embeddings for query: %s", question)
         query_embeddings = await embeddings_service.create_multi_query_embedding(question)
-        print(f"Generated {len(query_embeddings)} query variations")
+        logger.debug("Generated %d query variations", len(query_embeddings))
         
         # RAG Pipeline Step 2: ENHANCED SEARCH - Documents + Learned Knowledge
-        print("🔍 Enhanced search in documents AND learned knowledge...")
+        logger.debug("Enhanced search in documents AND learned knowledge...")
         
         # Search in documents (existing logic)
         similar_docs = []
         if HYBRID_SEARCH_AVAILABLE:
-            print("🔍 Using Context7 Hybrid Search (BM25 + Semantic + Re-ranking)")
+            logger.debug("Using Hybrid Search (BM25 + Semantic + Re-ranking)")
             
             # Get all documents for hybrid indexing
             all_docs = await vector_store_service.get_all_documents()
@@ -404,16 +451,16 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
                             "search_type": result.get("search_type", "hybrid")
                         })
                     
-                    print(f"✅ Hybrid document search found {len(similar_docs)} results")
+                    logger.debug("Hybrid document search found %d results", len(similar_docs))
                 else:
-                    print("⚠️ Hybrid indexing failed, falling back to standard search")
+                    logger.warning("Hybrid indexing failed, falling back to standard search")
                     similar_docs = await vector_store_service.search_similar_documents_multi_query(
                         query_embeddings=query_embeddings,
                         top_k=settings.DEFAULT_TOP_K,
                         filter_metadata=None
                     )
             else:
-                print("⚠️ No documents found for hybrid search, using standard search")
+                logger.debug("No documents found for hybrid search, using standard search")
                 similar_docs = await vector_store_service.search_similar_documents_multi_query(
                     query_embeddings=query_embeddings,
                     top_k=settings.DEFAULT_TOP_K,
@@ -421,7 +468,7 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
                 )
         else:
             # Fallback to standard search
-            print("🔍 Using standard semantic search")
+            logger.debug("Using standard semantic search")
             similar_docs = await vector_store_service.search_similar_documents_multi_query(
                 query_embeddings=query_embeddings,
                 top_k=settings.DEFAULT_TOP_K,
@@ -431,39 +478,39 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
         # RAG Pipeline Step 2.5: NEW - Search in Learned Knowledge
         learned_knowledge = []
         try:
-            print("🎓 STEP 2.5: Searching learned knowledge...")
-            print(f"🔍 Query embeddings count: {len(query_embeddings)}")
+            logger.debug("STEP 2.5: Searching learned knowledge...")
+            logger.debug("Query embeddings count: %d", len(query_embeddings))
             try:
                 first_dim = len(query_embeddings[0]) if query_embeddings and len(query_embeddings) > 0 else 0
             except (TypeError, IndexError):
                 first_dim = 0
-            print(f"📏 First embedding dimension: {first_dim}")
+            logger.debug("First embedding dimension: %d", first_dim)
             
-            with next(get_session()) as session:
-                print("📁 Database session created, calling search function...")
+            # Own short-lived session: next(get_session()) never closed its generator
+            # and rebound the request-scoped `session` used later to save messages
+            with Session(engine) as learned_session:
+                logger.debug("Database session created, calling search function...")
                 learned_knowledge = await search_learned_knowledge(
                     query_embeddings=query_embeddings,
                     top_k=3,  # Get top 3 learned items
-                    session=session
+                    session=learned_session
                 )
-                print(f"✅ Learned knowledge search returned {len(learned_knowledge)} items")
+                logger.debug("Learned knowledge search returned %d items", len(learned_knowledge))
                 for i, item in enumerate(learned_knowledge):
-                    print(f"   🎯 {i+1}. {item.get('source', 'Unknown')}: {item.get('content', '')[:100]}...")
+                    logger.debug("   %d. %s: %.100s...", i + 1, item.get('source', 'Unknown'), item.get('content', ''))
         except Exception as e:
-            print(f"❌ ERROR in learned knowledge search: {str(e)}")
-            import traceback
-            print(f"🔥 Full traceback: {traceback.format_exc()}")
+            logger.exception("Learned knowledge search failed: %s", e)
             learned_knowledge = []  # Continue with empty learned knowledge
         
         # RAG Pipeline Step 3: Combine Documents + Learned Knowledge
-        print(f"STEP 3: Combining {len(similar_docs)} documents + {len(learned_knowledge)} learned knowledge")
+        logger.debug("STEP 3: Combining %d documents + %d learned knowledge", len(similar_docs), len(learned_knowledge))
         all_sources = similar_docs + learned_knowledge
         all_sources.sort(key=lambda x: x["score"], reverse=True)
         
         # Take top results (mix of documents and learned knowledge)
         top_sources = all_sources[:settings.DEFAULT_TOP_K]
         
-        print(f"Combined search results: {len(similar_docs)} documents + {len(learned_knowledge)} learned items = {len(top_sources)} total")
+        logger.debug("Combined search results: %d documents + %d learned items = %d total", len(similar_docs), len(learned_knowledge), len(top_sources))
         
         # RAG Pipeline Step 4: Use retrieved sources if available
         if top_sources:
@@ -503,36 +550,23 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
             
             context = "\n\n".join(context_parts)
             
-            # Enhanced debug output
-            print(f"🔍 DEBUG - Context being sent to AI:")
-            print("="*50)
-            for i, doc in enumerate(top_sources[:5]):  # Show first 5 for debugging
-                content = doc.get("content", "")
-                source = doc.get("source", "unknown")
-                print(f"[Kaynak {i+1}] {content}")
-            print("="*50)
-            print(f"🔍 DEBUG - User question: {question}")
-            print("="*50)
-            
-            # *** ADDITIONAL DEBUG: Show the exact full content ***
-            print(f"🔍 FULL CONTEXT DEBUG:")
-            print("-"*50)
-            for i, doc in enumerate(top_sources):
-                content = doc.get("content", "")
-                source = doc.get("source", "unknown")
-                print(f"FULL CHUNK {i+1} from {source}:")
-                print(f"Content: '{content}'")
-                print(f"Length: {len(content)} chars")
-                print("-"*30)
-            print("-"*50)
-            
-            # Also write to file for debugging
-            with open("debug_context.txt", "w", encoding="utf-8") as f:
-                f.write(f"USER QUESTION: {question}\n")
-                f.write("=" * 50 + "\n")
-                f.write("CONTEXT SENT TO AI:\n")
-                f.write(context)
-                f.write("\n" + "=" * 50 + "\n")
+            # Full context dump (and debug_context.txt) only when DEBUG logging is on;
+            # otherwise every request paid for formatting and a synchronous file write
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("User question: %s", question)
+                for i, doc in enumerate(top_sources):
+                    content = doc.get("content", "")
+                    logger.debug(
+                        "Context chunk %d from %s (%d chars): %r",
+                        i + 1, doc.get("source", "unknown"), len(content), content
+                    )
+                
+                with open("debug_context.txt", "w", encoding="utf-8") as f:
+                    f.write(f"USER QUESTION: {question}\n")
+                    f.write("=" * 50 + "\n")
+                    f.write("CONTEXT SENT TO AI:\n")
+                    f.write(context)
+                    f.write("\n" + "=" * 50 + "\n")
             
             # RAG Pipeline Step 5: Create enhanced prompt with priority for learned knowledge
             
@@ -556,49 +590,19 @@ async def query_documents(request: ChatQueryRequest, session: Session = Depends(
                     doc_parts.append(f"[Belge {i+1}] {doc.get('content', '')}")
                 document_context = "\n\n".join(doc_parts)
             
-            prompt = f"""Sen bir profesyonel Türk bankacılık uzmanısın. Kullanıcı sorularını yanıtlarken öğrenilen bilgileri ÖNCELİKLE kullan, sonra belge bilgilerini kullan.
-
-{"🎓 ÖĞRENİLEN BİLGİLER (ÖNCELİKLİ):" if learned_context else ""}
-{learned_context}
-
-{"📄 BELGE BİLGİLERİ:" if document_context else ""}
-{document_context}
-
-KULLANICI SORUSU: {question}
-
-ÖNEMLİ TALİMATLAR:
-1. **ÖĞRENİLEN BİLGİ ÖNCELİĞİ**: Eğer öğrenilen bilgiler arasında soruyla ilgili bir prosedür/bilgi varsa, bunu yanıtın en başında ve net şekilde belirt
-2. **ÖĞRENİLEN BİLGİ VURGUSU**: Öğrenilen bilgileri "💡 **Öğrenilen Prosedür:**" başlığıyla vurgula
-3. **KAYNAK BELİRTME**: Öğrenilen bilgileri [Öğrenilen 1], belge bilgilerini [Belge 1] formatında belirt
-4. **TAM ENTEGRASYON**: Hem öğrenilen hem de belge bilgilerini kullanarak kapsamlı yanıt ver
-5. **SPESİFİK ÖNCELİK**: Kullanıcının tam sorusuna öğrenilen bilgiler cevap veriyorsa, bunu yanıtın en başına koy
-
-YANITLAMA STRATEJİSİ:
-- Önce öğrenilen prosedürleri kontrol et ve uygunsa kullan
-- Sonra belge bilgileriyle destekle veya genişlet
-- Her bilgi kaynağını açıkça belirt
-
-CEVAP:"""
+            prompt = RAG_PROMPT_TEMPLATE.format(
+                learned_header="🎓 ÖĞRENİLEN BİLGİLER (ÖNCELİKLİ):" if learned_context else "",
+                learned_context=learned_context,
+                document_header="📄 BELGE BİLGİLERİ:" if document_context else "",
+                document_context=document_context,
+                question=question,
+            )
 
         else:
             # No relevant documents found
-            print("No relevant documents found, using general knowledge")
+            logger.debug("No relevant documents found, using general knowledge")
             sources = []
-            prompt = f"""Sen bir profesyonel Türk bankacılık uzmanısın.
-
-⚠️ DURUM: Sisteme yüklenmiş belgeler arasında bu soruyla doğrudan ilgili spesifik bir belge bulunamadı.
-
-KULLANICI SORUSU: {question}
-
-GÖREVİN:
-1. Genel bankacılık bilginle soruya kısa ve faydalı bir cevap ver
-2. Daha kesin bilgi için ilgili belgelerin sisteme yüklenmesi gerektiğini belirt
-3. Mümkünse genel prosedürler hakkında bilgi ver
-4. Türkçe olarak yanıtla
-
-ÖNEMLİ: Genel bilgi verirken, spesifik kurum politikaları için belge yüklenmesi gerektiğini hatırlat.
-
-CEVAP:"""
+            prompt = GENERAL_PROMPT_TEMPLATE.format(question=question)
 
         # RAG Pipeline Step 6: Generate response using Gemini 2.5 Flash-Lite Preview
         if USE_ROTATION:
@@ -625,15 +629,15 @@ CEVAP:"""
                 raise Exception("Rotation service not available")
         else:
             # Use single client
-            response = await asyncio.to_thread(
-                client.models.generate_content,
-                model=settings.GEMINI_MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=settings.DEFAULT_TEMPERATURE,
-                    max_output_tokens=1000,
+            async with gemini_request_limiter:
+                response = await client.aio.models.generate_content(
+                    model=settings.GEMINI_MODEL,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=settings.DEFAULT_TEMPERATURE,
+                        max_output_tokens=1000,
+                    )
                 )
-            )
         
         response_time_ms = int((time.time() - start_time) * 1000)
         
@@ -642,7 +646,7 @@ CEVAP:"""
         
         # NEW: Step 7 - INTELLIGENT RESPONSE OPTIMIZATION & FORMATTING (TEMPORARILY DISABLED)
         # CONTEXT7 ROLLBACK: Services causing content deletion, using raw answer directly
-        print(f"🎯 STEP 7: Intelligent Response Optimization... (DISABLED)")
+        logger.debug("STEP 7: Intelligent Response Optimization... (DISABLED)")
         
         # TEMPORARILY SKIP optimization that deletes content
         # try:
@@ -672,7 +676,7 @@ CEVAP:"""
         
         # NEW: Context7 verified Response Optimization using Gemini API
         try:
-            print(f"🤖 STEP 7: Multi-Agent Response Optimization...")
+            logger.debug("STEP 7: Multi-Agent Response Optimization...")
             from app.services.response_optimizer_service import optimize_rag_response
             
             # Gemini API optimization workflow
@@ -680,10 +684,10 @@ CEVAP:"""
             
             if optimization_result.optimization_applied:
                 final_answer = optimization_result.optimized_response.optimized_content
-                print(f"✅ Response optimized successfully!")
-                print(f"📊 Analysis - Clarity: {optimization_result.analysis.clarity_score}/10")
-                print(f"⚡ Optimization Score: {optimization_result.optimized_response.optimization_score}/10")
-                print(f"🕒 Optimization Time: {optimization_result.processing_time_ms}ms")
+                logger.debug("Response optimized successfully")
+                logger.debug("Analysis - Clarity: %s/10", optimization_result.analysis.clarity_score)
+                logger.debug("Optimization Score: %s/10", optimization_result.optimized_response.optimization_score)
+                logger.debug("Optimization Time: %sms", optimization_result.processing_time_ms)
                 
                 # Store optimization metadata
                 optimization_metadata = {
@@ -701,7 +705,7 @@ CEVAP:"""
                     "reason": "Gemini API optimization not available",
                     "processing_time_ms": optimization_result.processing_time_ms
                 }
-                print(f"⚠️ Response optimization skipped - using raw answer")
+                logger.debug("Response optimization skipped - using raw answer")
             
         except Exception as e:
             final_answer = raw_answer
@@ -710,13 +714,12 @@ CEVAP:"""
                 "error": str(e),
                 "processing_time_ms": 0
             }
-            print(f"⚠️ Response optimization failed: {e}")
-            print(f"📝 Using raw answer as fallback")
+            logger.debug("Response optimization failed, using raw answer as fallback: %s", e)
         
         optimized_response = None
         formatted_response = None
         
-        print(f"📝 Final answer length: {len(final_answer)} characters")
+        logger.debug("Final answer length: %d characters", len(final_answer))
         
         # Simplified response without AI intelligence features
         related_questions = []
@@ -737,7 +740,7 @@ CEVAP:"""
                 }
             )
         except Exception as e:
-            print(f"⚠️ WebSocket notification error (non-critical): {e}")
+            logger.warning("WebSocket notification error (non-critical): %s", e)
             # Continue with response even if WebSocket fails
 
         # Phase 5.4: Cache the successful response (Context7 verified)
@@ -768,11 +771,12 @@ CEVAP:"""
                 ttl_hours=24
             )
         except Exception as e:
-            print(f"⚠️ Caching error (non-critical): {e}")
+            logger.warning("Caching error (non-critical): %s", e)
 
         # Context7 verified: Save assistant message to conversation
         if conversation:
             try:
+                now = datetime.utcnow()  # One timestamp for the message and conversation metadata
                 assistant_message = ConversationMessage(
                     conversation_id=str(conversation.id),
                     message_type="assistant",
@@ -783,22 +787,22 @@ CEVAP:"""
                     response_time_ms=response_time_ms,
                     confidence_score=0.9 if top_sources else 0.3,
                     sources_used=[source.source for source in sources] if sources else [],
-                    created_at=datetime.utcnow()
+                    created_at=now
                 )
                 session.add(assistant_message)
                 
                 # Update conversation metadata
                 conversation.message_count += 1
-                conversation.last_activity = datetime.utcnow()
-                conversation.updated_at = datetime.utcnow()
+                conversation.last_activity = now
+                conversation.updated_at = now
                 
                 session.commit()
-                print(f"✅ Assistant message saved to conversation {conversation.id}")
+                logger.debug("Assistant message saved to conversation %s", conversation.id)
                 
                 # Context7 verified: Auto-generate intelligent title if needed
                 if conversation.message_count == 2 and conversation.title.startswith("Chat "):
                     try:
-                        print(f"🎯 Generating intelligent title for conversation {conversation.id}")
+                        logger.debug("Generating intelligent title for conversation %s", conversation.id)
                         intelligent_title = await chat_title_service.generate_title(
                             first_user_message=question,
                             first_ai_response=final_answer
@@ -807,13 +811,13 @@ CEVAP:"""
                         if intelligent_title and intelligent_title != conversation.title:
                             conversation.title = intelligent_title
                             session.commit()
-                            print(f"✅ Updated conversation title to: '{intelligent_title}'")
+                            logger.debug("Updated conversation title to: '%s'", intelligent_title)
                     except Exception as title_error:
-                        print(f"⚠️ Title generation failed: {title_error}")
+                        logger.warning("Title generation failed: %s", title_error)
                         
             except Exception as e:
                 session.rollback()
-                print(f"⚠️ Failed to save assistant message: {e}")
+                logger.warning("Failed to save assistant message: %s", e)
 
         return ChatQueryResponse(
             answer=final_answer,
@@ -870,7 +874,7 @@ CEVAP:"""
         
     except Exception as e:
         response_time_ms = int((time.time() - start_time) * 1000)
-        print(f"❌ RAG Pipeline Error: {str(e)}")
+        logger.error("RAG Pipeline Error: %s", e)
         # Context7 verified: Return structured error response
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -894,8 +898,7 @@ async def chat_health_check():
     if GEMINI_AVAILABLE:
         try:
             # Test Gemini API with a simple query (Context7 verified pattern)
-            test_response = await asyncio.to_thread(
-                client.models.generate_content,
+            test_response = await client.aio.models.generate_content(
                 model=settings.GEMINI_MODEL,
                 contents="Test",
                 config=types.GenerateContentConfig(max_output_tokens=10)
@@ -143,6 +143,15 @@ class Settings(BaseSettings):
             print(f"🔑 Single API key mode: {len(parsed_keys)} key(s)")
         return self
     
+    # Local Sentence Transformers embeddings
+    SENTENCE_TRANSFORMER_DEVICE: str = "cpu"
+    SENTENCE_TRANSFORMER_NUM_THREADS: int = 2  # Intra-op threads; low counts suit small batches
+    SENTENCE_TRANSFORMER_DTYPE: Literal["fp32", "bf16"] = "fp32"  # bf16 only pays off on CPUs with native BF16
+    SENTENCE_TRANSFORMER_BACKEND: Literal["torch", "onnx"] = "torch"  # onnx requires sentence-transformers[onnx]
+    SENTENCE_TRANSFORMER_ONNX_FILE: str = "onnx/model_qint8_avx512_vnni.onnx"  # Dynamic int8 export, fastest on VNNI CPUs
+    SENTENCE_TRANSFORMER_BATCH_SIZE: int = 64  # Library default is 32; document ingestion benefits from larger batches
+    SENTENCE_TRANSFORMER_MAX_WORKERS: int = 2  # Concurrent encode() calls; each already uses NUM_THREADS intra-op threads
+    
     # Text Processing Settings (from PRD requirements)
     CHUNK_SIZE: int = 1000  # Character-based chunking
     CHUNK_OVERLAP: int = 200  # Overlap between chunks
@@ -163,12 +172,14 @@ class Settings(BaseSettings):
     # Rate Limiting (based on Gemini free tier)
     MAX_REQUESTS_PER_MINUTE: int = 15  # Gemini Flash-Lite Preview limit
     MAX_REQUESTS_PER_DAY: int = 1000   # Daily limit from PRD
+    GEMINI_MAX_CONCURRENT: int = 8  # In-flight Gemini requests per process (embeddings + generation)
     
     # Query Settings
     DEFAULT_TOP_K: int = 10  # Number of chunks to retrieve (optimized)
     DEFAULT_TEMPERATURE: float = 0.3  # LLM temperature
     MAX_QUERY_LENGTH: int = 500  # Maximum query characters
     SIMILARITY_THRESHOLD: float = 0.25  # Minimum similarity for retrieval (optimized for Sentence Transformers)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # LRU entries for repeated query embeddings
 
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
@@ -13,6 +13,10 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Process-wide cap on in-flight Gemini requests (all keys, embeddings and generation);
+# excess callers wait here instead of piling up 429s
+gemini_request_limiter = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENT)
+
 class GeminiAPIRotationService:
     """
     Context7 verified API rotation service for multiple Gemini API keys
@@ -202,15 +206,15 @@ class GeminiAPIRotationService:
             
             try:
                 # Context7 verified embedding creation
-                response = await asyncio.to_thread(
-                    client.models.embed_content,
-                    model=model,
-                    contents=texts,
-                    config=types.EmbedContentConfig(
-                        output_dimensionality=settings.GEMINI_EMBEDDING_DIMENSION,
-                        task_type="retrieval_document"
+                async with gemini_request_limiter:
+                    response = await client.aio.models.embed_content(
+                        model=model,
+                        contents=texts,
+                        config=types.EmbedContentConfig(
+                            output_dimensionality=settings.GEMINI_EMBEDDING_DIMENSION,
+                            task_type="retrieval_document"
+                        )
                     )
-                )
                 
                 # Success - update status
                 self.key_status[current_key]["successful_requests"] += 1
@@ -276,15 +280,15 @@ class GeminiAPIRotationService:
             
             try:
                 # Context7 verified content generation
-                response = await asyncio.to_thread(
-                    client.models.generate_content,
-                    model=model,
-                    contents=contents,
-                    config=config or types.GenerateContentConfig(
-                        temperature=settings.DEFAULT_TEMPERATURE,
-                        max_output_tokens=1000
+                async with gemini_request_limiter:
+                    response = await client.aio.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=config or types.GenerateContentConfig(
+                            temperature=settings.DEFAULT_TEMPERATURE,
+                            max_output_tokens=1000
+                        )
                     )
-                )
                 
                 # Success
                 self.key_status[current_key]["successful_requests"] += 1
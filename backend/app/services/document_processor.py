@@ -379,7 +379,8 @@ class DocumentProcessor:
             # Step 3: Generate embeddings
             print(f"Generating embeddings for {len(chunks)} chunks...")
             chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = await embeddings_service.create_embeddings(chunk_texts)
+            # Keep the (N, D) array; the vector store converts rows only where it needs lists
+            embeddings = await embeddings_service.create_embeddings_np(chunk_texts)
             
             # Step 4: Prepare documents for vector store
             documents_for_vector_store = []
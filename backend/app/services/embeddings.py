@@ -1,19 +1,29 @@
 import asyncio
+import functools
 import hashlib
+import itertools
 import logging
 import re
-from typing import List, Dict, Any, Optional
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import List, Dict, Any, Iterable, Iterator, Mapping, Optional, Tuple
 
+import numpy as np
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from app.core.config import settings
+
 # Check availability of optional dependencies
 OPENAI_AVAILABLE = False
 GEMINI_AVAILABLE = False
 SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 try:
+    import httpx
     import openai
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     pass
@@ -26,6 +36,7 @@ except ImportError:
     pass
 
 try:
+    import torch
     from sentence_transformers import SentenceTransformer
     SENTENCE_TRANSFORMERS_AVAILABLE = True
 except ImportError:
@@ -38,6 +49,49 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on memoized query words in the synonym reverse map
+_WORD_SYNONYM_CACHE_SIZE = 4096
+
+# Chunk boundary candidates; the lookahead also reports overlapping "\n\n" runs
+_SENTENCE_END_PATTERN = re.compile(r"[.!?]")
+_PARAGRAPH_BREAK_PATTERN = re.compile(r"(?=\n\n)")
+
+# Turkish domain-specific synonym mapping for better search (shared, read-only)
+_TURKISH_SYNONYMS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    base_word: tuple(synonyms) for base_word, synonyms in {
+        # Behavior and attitude synonyms
+        'tavir': ['davranis', 'tutum', 'yaklasim', 'hal', 'davranisi', 'tutumu'],
+        'tarzi': ['davranisi', 'tutumu', 'yaklasimi', 'tarzi', 'davranis', 'tutum'],
+        'davranis': ['tavir', 'tutum', 'yaklasim', 'hal'],
+        'tutum': ['tavir', 'davranis', 'yaklasim', 'hal'],
+        'sikayet': ['sikayetci', 'problem', 'sorun', 'memnuniyetsizlik', 'sikayette'],
+        'sikayetci': ['sikayet', 'problem', 'sorun', 'memnuniyetsizlik'],
+        'personel': ['calisan', 'eleman', 'kisi', 'gorevli', 'personelinin'],
+        
+        # Courier related synonyms
+        'kurye': ['kuryeci', 'teslim eden', 'dagitici', 'kurye personeli'],
+        'kuryenin': ['kurye', 'kuryeci', 'teslim eden'],
+        'teslimat': ['teslim', 'dagitim', 'ulastirma'],
+        'gonderi': ['paket', 'kargo', 'sevkiyat'],
+        
+        # Banking terms
+        'kart': ['kredi karti', 'banka karti', 'plastik kart'],
+        'musteri': ['muvekkil', 'alici', 'kullanici', 'musteriler'],
+        'mbs': ['musteri bilgi sistemi', 'kayit sistemi'],
+    }.items()
+})
+
+# One overlapping scan finds the longest base word starting at each
+# position; the containment closure then recovers shorter base words
+# nested inside it (e.g. 'kurye' within 'kuryenin').
+_BASE_WORD_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(word) for word in sorted(_TURKISH_SYNONYMS, key=len, reverse=True)) + "))"
+)
+_BASE_WORD_CLOSURE: Mapping[str, frozenset] = MappingProxyType({
+    word: frozenset(other for other in _TURKISH_SYNONYMS if other in word)
+    for word in _TURKISH_SYNONYMS
+})
+
 class EmbeddingsService:
     def __init__(self):
         self.primary_provider = None
@@ -47,7 +101,6 @@ class EmbeddingsService:
         self.active_dimensions = None  # Track active embedding dimensions
         
         # Initialize API rotation if multiple keys provided
-        from ..core.config import settings
         if settings.USE_API_ROTATION and len(settings.parsed_gemini_api_keys) > 1:
             try:
                 from .api_rotation import get_rotation_service
@@ -57,9 +110,9 @@ class EmbeddingsService:
                     self.primary_provider = "gemini_rotation"
                     self.model = settings.GEMINI_EMBEDDING_MODEL
                     self.dimensions = settings.GEMINI_EMBEDDING_DIMENSION
-                    print(f"Gemini API rotation initialized with {len(settings.parsed_gemini_api_keys)} keys")
+                    logger.info("Gemini API rotation initialized with %d keys", len(settings.parsed_gemini_api_keys))
             except Exception as e:
-                print(f"Gemini rotation initialization failed: {e}")
+                logger.warning("Gemini rotation initialization failed: %s", e)
         
         # Initialize Gemini if available
         if GEMINI_AVAILABLE and not self.primary_provider:
@@ -69,16 +122,22 @@ class EmbeddingsService:
                     self.primary_provider = "gemini"
                     self.model = settings.GEMINI_EMBEDDING_MODEL
                     self.dimensions = settings.GEMINI_EMBEDDING_DIMENSION
-                    print("OK Gemini embeddings client initialized (PRIMARY)")
+                    logger.info("Gemini embeddings client initialized (PRIMARY)")
             except Exception as e:
-                print(f"ERROR Gemini embeddings failed: {e}")
+                logger.error("Gemini embeddings failed: %s", e)
                 self.gemini_client = None
         
         # Initialize OpenAI as fallback if available
         if OPENAI_AVAILABLE:
             try:
                 if settings.OPENAI_API_KEY:
-                    self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                    # Native async client with a shared keep-alive pool (no thread hop per call)
+                    self.openai_client = AsyncOpenAI(
+                        api_key=settings.OPENAI_API_KEY,
+                        http_client=httpx.AsyncClient(
+                            limits=httpx.Limits(max_keepalive_connections=32)
+                        )
+                    )
                     if not self.primary_provider:
                         self.primary_provider = "openai"
                         self.model = "text-embedding-3-small"
@@ -92,8 +151,27 @@ class EmbeddingsService:
         # Try Sentence Transformers as free local fallback (ALWAYS INITIALIZE AS FALLBACK)
         if SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
+                # MiniLM on small batches is faster with few intra-op threads
+                torch.set_num_threads(settings.SENTENCE_TRANSFORMER_NUM_THREADS)
+                try:
+                    torch.set_num_interop_threads(1)
+                except RuntimeError:
+                    pass  # Can only be set before inter-op parallel work starts
+                
                 # Use lightweight, high-quality model
-                self.sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
+                self.sentence_transformer = self._load_sentence_transformer('all-MiniLM-L6-v2')
+                # ONNX sessions manage their own precision; dtype casts only apply to torch
+                torch_backend = getattr(self.sentence_transformer, 'backend', 'torch') == "torch"
+                if torch_backend and settings.SENTENCE_TRANSFORMER_DTYPE == "bf16" and hasattr(torch, 'bfloat16'):
+                    # Halves weight bandwidth on BF16-capable CPUs (AVX512-BF16/AMX, Zen4)
+                    self.sentence_transformer = self.sentence_transformer.to(dtype=torch.bfloat16)
+                elif torch_backend and settings.SENTENCE_TRANSFORMER_DEVICE.startswith("cuda"):
+                    # FP16 doubles tensor-core throughput and halves activation memory on GPU
+                    self.sentence_transformer = self.sentence_transformer.half()
+                self._encode_executor = ThreadPoolExecutor(
+                    max_workers=settings.SENTENCE_TRANSFORMER_MAX_WORKERS,
+                    thread_name_prefix="st-encode"
+                )
                 if not self.fallback_provider:
                     self.fallback_provider = "sentence_transformers"
                 # If no primary provider yet, make it primary
@@ -101,54 +179,39 @@ class EmbeddingsService:
                     self.primary_provider = "sentence_transformers"
                     self.model = "all-MiniLM-L6-v2"
                     self.dimensions = 384  # MiniLM dimensions
-                print("OK Sentence Transformers initialized (FALLBACK)")
+                logger.info("Sentence Transformers initialized (FALLBACK)")
             except Exception as e:
-                print(f"ERROR Sentence Transformers failed: {e}")
+                logger.error("Sentence Transformers failed: %s", e)
                 self.sentence_transformer = None
         
         # Final fallback to hash-based
         if not self.primary_provider:
-            print("Using hash-based fallback embeddings")
+            logger.info("Using hash-based fallback embeddings")
             self.primary_provider = "fallback"
             self.model = "fallback-embeddings"
             self.dimensions = 768  # Match text-embedding-004
         
         # Initialize cache and encoding
-        self._cache = {}
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()  # LRU of query embeddings
         if OPENAI_AVAILABLE:
             try:
                 self.encoding = tiktoken.get_encoding("cl100k_base")
             except Exception:
                 self.encoding = None
         
-        # Turkish domain-specific synonym mapping for better search
-        self.turkish_synonyms = {
-            # Behavior and attitude synonyms
-            'tavir': ['davranis', 'tutum', 'yaklasim', 'hal', 'davranisi', 'tutumu'],
-            'tarzi': ['davranisi', 'tutumu', 'yaklasimi', 'tarzi', 'davranis', 'tutum'],
-            'davranis': ['tavir', 'tutum', 'yaklasim', 'hal'],
-            'tutum': ['tavir', 'davranis', 'yaklasim', 'hal'],
-            'sikayet': ['sikayetci', 'problem', 'sorun', 'memnuniyetsizlik', 'sikayette'],
-            'sikayetci': ['sikayet', 'problem', 'sorun', 'memnuniyetsizlik'],
-            'personel': ['calisan', 'eleman', 'kisi', 'gorevli', 'personelinin'],
-            
-            # Courier related synonyms
-            'kurye': ['kuryeci', 'teslim eden', 'dagitici', 'kurye personeli'],
-            'kuryenin': ['kurye', 'kuryeci', 'teslim eden'],
-            'teslimat': ['teslim', 'dagitim', 'ulastirma'],
-            'gonderi': ['paket', 'kargo', 'sevkiyat'],
-            
-            # Banking terms
-            'kart': ['kredi karti', 'banka karti', 'plastik kart'],
-            'musteri': ['muvekkil', 'alici', 'kullanici', 'musteriler'],
-            'mbs': ['musteri bilgi sistemi', 'kayit sistemi'],
-        }
-        
-        logger.info(f"EmbeddingsService initialized: {self.primary_provider} ({self.model})")
+        # Reverse map: query word -> synonyms added by the combined query.
+        # Seeded with every base word; other words are memoized on first use.
+        self._word_to_syns: Dict[str, List[str]] = {}
+        for base_word in _TURKISH_SYNONYMS:
+            self._word_to_syns[base_word] = self._match_word_synonyms(base_word)
+
+        logger.info("EmbeddingsService initialized: %s (%s)", self.primary_provider, self.model)
     
-    def _get_cache_key(self, text: str) -> str:
-        """Generate cache key for text"""
-        return hashlib.sha256(f"{self.primary_provider}:{text}".encode()).hexdigest()
+    def _get_cache_key(self, text: str, provider: str) -> str:
+        """Generate cache key for text embedded by provider"""
+        if provider == "gemini_rotation":
+            provider = "gemini"  # Same model and vectors, whichever key served them
+        return hashlib.sha256(f"{provider}:{text}".encode()).hexdigest()
     
     def _count_tokens(self, text: str) -> int:
         """Count tokens in text"""
@@ -180,82 +243,124 @@ class EmbeddingsService:
         
         return vector
     
-    async def _create_gemini_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def _create_gemini_embeddings(self, texts: List[str]) -> np.ndarray:
         """Create embeddings using Gemini API (Context7 verified pattern)"""
         try:
-            print(f"Creating Gemini embeddings for {len(texts)} texts...")
-            print(f"Using model: {self.model}")
+            logger.debug("Creating Gemini embeddings for %d texts using %s", len(texts), self.model)
             
-            # Use asyncio.to_thread for sync API calls
-            embeddings_response = await asyncio.to_thread(
-                self.gemini_client.models.embed_content,
-                model=self.model,
-                contents=texts
-            )
+            # Native async client: no worker thread per request
+            from .api_rotation import gemini_request_limiter
+            async with gemini_request_limiter:
+                embeddings_response = await self.gemini_client.aio.models.embed_content(
+                    model=self.model,
+                    contents=texts
+                )
             
             if not hasattr(embeddings_response, 'embeddings') or not embeddings_response.embeddings:
-                print(f"No embeddings in response. Response type: {type(embeddings_response)}")
-                print(f"Response dir: {dir(embeddings_response)}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "No embeddings in response. Response type: %s, dir: %s",
+                        type(embeddings_response), dir(embeddings_response)
+                    )
                 raise Exception("No embeddings returned from Gemini API")
             
-            embeddings = [emb.values for emb in embeddings_response.embeddings]
-            print(f"Created {len(embeddings)} Gemini embeddings")
+            embeddings = np.asarray(
+                [emb.values for emb in embeddings_response.embeddings], dtype=np.float32
+            )
+            logger.debug("Created %d Gemini embeddings", len(embeddings))
             return embeddings
             
         except Exception as e:
             error_msg = str(e)
-            print(f"Gemini embedding error: {error_msg}")
-            print(f"Error type: {type(e).__name__}")
+            logger.warning("Gemini embedding error (%s): %s", type(e).__name__, error_msg)
             # Include more context in error
             raise Exception(f"Gemini API Error: {error_msg} (Type: {type(e).__name__})")
     
-    async def _create_sentence_transformer_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _load_sentence_transformer(self, model_name: str):
+        """Load the local encoder, preferring the quantized ONNX backend when configured"""
+        if settings.SENTENCE_TRANSFORMER_BACKEND == "onnx":
+            try:
+                model = SentenceTransformer(
+                    model_name,
+                    device=settings.SENTENCE_TRANSFORMER_DEVICE,
+                    backend="onnx",
+                    model_kwargs={"file_name": settings.SENTENCE_TRANSFORMER_ONNX_FILE}
+                )
+                logger.info("Sentence Transformers loaded with ONNX backend (%s)", settings.SENTENCE_TRANSFORMER_ONNX_FILE)
+                return model
+            except Exception as e:
+                logger.warning("ONNX backend unavailable, using torch: %s", e)
+        
+        model = SentenceTransformer(model_name, device=settings.SENTENCE_TRANSFORMER_DEVICE)
+        model.eval()
+        return model
+
+    def _encode_sentence_transformer(self, texts: List[str], **kwargs):
+        """Run the local encoder without autograd tracking (runs in a worker thread)"""
+        with torch.inference_mode():
+            return self.sentence_transformer.encode(texts, **kwargs)
+
+    async def _create_sentence_transformer_embeddings(self, texts: List[str]) -> np.ndarray:
         """Create embeddings using Sentence Transformers (FREE LOCAL)"""
         try:
-            print(f"Creating Sentence Transformer embeddings for {len(texts)} texts...")
-            print(f"Using model: {self.model} (LOCAL - NO API COSTS)")
+            logger.debug("Creating Sentence Transformer embeddings for %d texts using %s", len(texts), self.model)
             
-            # Use asyncio.to_thread to avoid blocking
-            embeddings = await asyncio.to_thread(
-                self.sentence_transformer.encode,
-                texts,
-                convert_to_tensor=False,
-                show_progress_bar=len(texts) > 10
+            # Run on the bounded encode pool so concurrent requests queue instead of
+            # piling torch work onto the shared default executor
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self._encode_executor,
+                functools.partial(
+                    self._encode_sentence_transformer,
+                    texts,
+                    batch_size=settings.SENTENCE_TRANSFORMER_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    show_progress_bar=len(texts) > 10
+                )
             )
             
-            # Convert to list of lists
-            embeddings_list = [emb.tolist() if hasattr(emb, 'tolist') else list(emb) for emb in embeddings]
+            # Already an (N, D) array; asarray is a no-op for float32 output
+            embeddings = np.asarray(embeddings, dtype=np.float32)
             
-            print(f"Created {len(embeddings_list)} Sentence Transformer embeddings (FREE)")
-            return embeddings_list
+            logger.debug("Created %d Sentence Transformer embeddings", len(embeddings))
+            return embeddings
                 
         except Exception as e:
             error_msg = str(e)
-            print(f"Sentence Transformer error: {error_msg}")
+            logger.warning("Sentence Transformer error: %s", error_msg)
             raise Exception(f"Sentence Transformer Error: {error_msg}")
 
-    async def _create_openai_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def _create_openai_embeddings(self, texts: List[str]) -> np.ndarray:
         """Create embeddings using OpenAI (Context7 verified pattern)"""
         try:
-            response = await asyncio.to_thread(
-                self.openai_client.embeddings.create,
+            response = await self.openai_client.embeddings.create(
                 model="text-embedding-3-small",
                 input=texts,
                 dimensions=1536
             )
             
-            embeddings = [embedding.embedding for embedding in response.data]
-            print(f"Created {len(embeddings)} OpenAI embeddings")
+            embeddings = np.asarray(
+                [embedding.embedding for embedding in response.data], dtype=np.float32
+            )
+            logger.debug("Created %d OpenAI embeddings", len(embeddings))
             return embeddings
             
         except Exception as e:
-            print(f"OpenAI embedding error: {str(e)}")
+            logger.warning("OpenAI embedding error: %s", e)
             raise
 
     async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Create embeddings for texts using primary provider with rotation/fallback"""
-        print(f"Starting embeddings creation for {len(texts)} texts...")
-        print(f"Primary provider: {self.primary_provider}, Model: {self.model}")
+        embeddings = await self.create_embeddings_np(texts)
+        return embeddings.tolist()
+
+    async def create_embeddings_np(self, texts: List[str]) -> np.ndarray:
+        """Same as create_embeddings but returns a float32 (N, D) array without list conversion"""
+        embeddings, _ = await self._create_embeddings_with_provider(texts)
+        return embeddings
+
+    async def _create_embeddings_with_provider(self, texts: List[str]) -> Tuple[np.ndarray, str]:
+        """create_embeddings_np plus the name of the provider that produced the result"""
+        logger.debug("Starting embeddings creation for %d texts (provider: %s, model: %s)", len(texts), self.primary_provider, self.model)
         
         # Try rotation service first if enabled
         if self.primary_provider == "gemini_rotation" and self.use_rotation:
@@ -263,76 +368,100 @@ class EmbeddingsService:
             rotation_service = get_rotation_service()
             if rotation_service:
                 try:
-                    print(f"Using API rotation service with {len(rotation_service.api_keys)} keys")
+                    logger.debug("Using API rotation service with %d keys", len(rotation_service.api_keys))
                     result = await rotation_service.create_embeddings_with_rotation(texts, self.model)
                     if result:
-                        print(f"Rotation service succeeded with {len(result)} embeddings")
+                        logger.debug("Rotation service succeeded with %d embeddings", len(result))
                         # SET ACTIVE PROVIDER
                         self.active_provider = "gemini_rotation"
                         self.active_dimensions = self.dimensions
-                        return result
+                        return np.asarray(result, dtype=np.float32), "gemini_rotation"
                     else:
-                        print("Rotation service returned None - all keys exhausted")
+                        logger.warning("Rotation service returned None - all keys exhausted")
                         # IMMEDIATE FALLBACK TO SENTENCE TRANSFORMERS
                         if hasattr(self, 'sentence_transformer'):
                             try:
-                                print("Rotation exhausted - Falling back to Sentence Transformers (FREE LOCAL)...")
+                                logger.info("Rotation exhausted - falling back to Sentence Transformers")
                                 result = await self._create_sentence_transformer_embeddings(texts)
                                 # SET ACTIVE PROVIDER
                                 self.active_provider = "sentence_transformers"
                                 self.active_dimensions = 384
-                                return result
+                                return result, "sentence_transformers"
                             except Exception as st_error:
-                                print(f"Sentence Transformers emergency fallback failed: {st_error}")
+                                logger.warning("Sentence Transformers emergency fallback failed: %s", st_error)
                 except Exception as e:
-                    print(f"Rotation service failed: {e}")
+                    logger.warning("Rotation service failed: %s", e)
         
         # Try primary provider
         if self.primary_provider == "sentence_transformers" and hasattr(self, 'sentence_transformer'):
             try:
-                return await self._create_sentence_transformer_embeddings(texts)
+                return await self._create_sentence_transformer_embeddings(texts), "sentence_transformers"
             except Exception as e:
-                print(f"Sentence Transformers failed: {e}")
+                logger.warning("Sentence Transformers failed: %s", e)
         elif self.primary_provider in ["gemini", "gemini_rotation"] and hasattr(self, 'gemini_client'):
             try:
-                return await self._create_gemini_embeddings(texts)
+                return await self._create_gemini_embeddings(texts), "gemini"
             except Exception as e:
-                print(f"Gemini failed: {e}")
+                logger.warning("Gemini failed: %s", e)
         elif self.primary_provider == "openai" and hasattr(self, 'openai_client'):
             try:
-                return await self._create_openai_embeddings(texts)
+                return await self._create_openai_embeddings(texts), "openai"
             except Exception as e:
-                print(f"OpenAI failed: {e}")
+                logger.warning("OpenAI failed: %s", e)
         
         # Fallback to sentence transformers if available
         if hasattr(self, 'sentence_transformer'):
             try:
-                print("Trying Sentence Transformers as fallback...")
-                return await self._create_sentence_transformer_embeddings(texts)
+                logger.debug("Trying Sentence Transformers as fallback")
+                return await self._create_sentence_transformer_embeddings(texts), "sentence_transformers"
             except Exception as e:
-                print(f"Sentence Transformers fallback failed: {e}")
+                logger.warning("Sentence Transformers fallback failed: %s", e)
         
         # Final fallback to hash-based
-        print("Using hash-based fallback...")
-        return [self._create_fallback_embedding(text) for text in texts]
+        logger.warning("Using hash-based fallback embeddings")
+        embeddings = np.asarray([self._create_fallback_embedding(text) for text in texts], dtype=np.float32)
+        return embeddings, "fallback"
     
+    def _first_embedding(self, embeddings: np.ndarray, text: str, provider: str) -> Tuple[List[float], str]:
+        """First row of a provider result as (list, provider); hash fallback if empty"""
+        if len(embeddings):
+            return embeddings[0].tolist(), provider
+        return self._create_fallback_embedding(text), "fallback"
+
     async def create_single_embedding(self, text: str) -> List[float]:
-        """Create embedding for single text with intelligent query routing (Context7 verified)"""
+        """Create embedding for single text, served from an LRU cache for repeated queries"""
+        # Only the first routing step runs before the lookup; the rest stays lazy for misses
+        providers = self._iter_query_providers()
+        first_provider = next(providers)
+        expected_provider = self.primary_provider if first_provider == "default" else first_provider
+        cache_key = self._get_cache_key(text, expected_provider)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+        
+        embedding, provider = await self._route_single_embedding(
+            text, itertools.chain([first_provider], providers)
+        )
+        # Hash vectors from an outage must not outlive it
+        if provider != "fallback":
+            self._cache[self._get_cache_key(text, provider)] = embedding
+            if len(self._cache) > settings.QUERY_EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return embedding
+
+    def _iter_query_providers(self) -> Iterator[str]:
+        """
+        Yield providers to try for a query embedding, in order (Context7 verified).
+        Always ends with "default", which defers to create_embeddings_np.
+        """
         # CONSISTENCY CHECK: If we have active provider from batch processing, use it
         if self.active_provider == "sentence_transformers" and hasattr(self, 'sentence_transformer'):
-            print(f"CONSISTENCY CHECK: Using {self.active_provider} for query (dim: {self.active_dimensions})")
-            try:
-                result = await self._create_sentence_transformer_embeddings([text])
-                return result[0] if result else self._create_fallback_embedding(text)
-            except Exception as e:
-                print(f"Consistency fallback failed: {e}")
+            logger.debug("Consistency check: using %s for query (dim: %s)", self.active_provider, self.active_dimensions)
+            yield "sentence_transformers"
         elif self.active_provider == "gemini" and hasattr(self, 'gemini_client'):
-            print(f"CONSISTENCY CHECK: Using {self.active_provider} for query (dim: {self.active_dimensions})")
-            try:
-                result = await self._create_gemini_embeddings([text])
-                return result[0] if result else self._create_fallback_embedding(text)
-            except Exception as e:
-                print(f"Consistency fallback failed: {e}")
+            logger.debug("Consistency check: using %s for query (dim: %s)", self.active_provider, self.active_dimensions)
+            yield "gemini"
         
         # ENHANCED CONSISTENCY: Check ChromaDB stored documents dimensions
         from .vector_store import vector_store_service
@@ -342,16 +471,12 @@ class EmbeddingsService:
             try:
                 # WORKAROUND: Skip complex dimension check, use simple document count check
                 total_docs = vector_store_service.chroma_collection.count()
-                print(f"🔍 ChromaDB has {total_docs} documents")
+                logger.debug("ChromaDB has %d documents", total_docs)
                 
                 # SIMPLE LOGIC: If we have recent documents (>3500), likely they use Sentence Transformers
                 if total_docs > 3500:
-                    print("🎯 FORCING Sentence Transformers based on document count (>3500)")
-                    try:
-                        result = await self._create_sentence_transformer_embeddings([text])
-                        return result[0] if result else self._create_fallback_embedding(text)
-                    except Exception as e:
-                        print(f"Forced Sentence Transformers failed: {e}")
+                    logger.debug("Forcing Sentence Transformers based on document count (>3500)")
+                    yield "sentence_transformers"
                 
                 # OLD COMPLEX CODE (COMMENTED OUT DUE TO NUMPY ARRAY ISSUE)
                 # sample_results = vector_store_service.chroma_collection.get(limit=1, include=["embeddings"])
@@ -394,7 +519,7 @@ class EmbeddingsService:
                 #         print(f"⚠️ Dimension detection failed: {dim_error}")
                 #         # Continue with fallback logic
             except Exception as e:
-                print(f"ChromaDB dimension check failed: {e}")
+                logger.warning("ChromaDB dimension check failed: %s", e)
         
         # Fallback to in-memory analysis if ChromaDB check failed
         if hasattr(vector_store_service, 'in_memory_vectors') and vector_store_service.in_memory_vectors:
@@ -410,66 +535,101 @@ class EmbeddingsService:
             majority_dim = max(dimension_counts.items(), key=lambda x: x[1])
             majority_dimension, majority_count = majority_dim
             
-            print(f"🔍 In-memory analysis: {total_docs} docs, dimensions: {dimension_counts}")
-            print(f"🎯 Majority dimension: {majority_dimension} ({majority_count}/{total_docs} docs)")
+            logger.debug("In-memory analysis: %d docs, dimensions: %s", total_docs, dimension_counts)
+            logger.debug("Majority dimension: %d (%d/%d docs)", majority_dimension, majority_count, total_docs)
             
             # Force majority dimension model
             if majority_dimension == 384 and hasattr(self, 'sentence_transformer'):
-                print("🔄 FORCING Sentence Transformers (majority dimension)")
-                try:
-                    result = await self._create_sentence_transformer_embeddings([text])
-                    return result[0] if result else self._create_fallback_embedding(text)
-                except Exception as e:
-                    print(f"Majority dimension (ST) failed: {e}")
+                logger.debug("Forcing Sentence Transformers (majority dimension)")
+                yield "sentence_transformers"
             elif majority_dimension == 3072 and hasattr(self, 'gemini_client'):
-                print("🔄 FORCING Gemini (majority dimension)")
-                try:
+                logger.debug("Forcing Gemini (majority dimension)")
+                yield "gemini"
+        
+        yield "default"
+
+    async def _route_single_embedding(self, text: str, providers: Iterable[str]) -> Tuple[List[float], str]:
+        """Embed a query with the first of providers that succeeds; returns (embedding, provider)"""
+        for provider in providers:
+            if provider == "default":
+                break
+            try:
+                if provider == "sentence_transformers":
+                    result = await self._create_sentence_transformer_embeddings([text])
+                else:
                     result = await self._create_gemini_embeddings([text])
-                    return result[0] if result else self._create_fallback_embedding(text)
-                except Exception as e:
-                    print(f"Majority dimension (Gemini) failed: {e}")
+                return self._first_embedding(result, text, provider)
+            except Exception as e:
+                logger.warning("Query embedding via %s failed: %s", provider, e)
         
         # Final fallback to default behavior
-        print("⚠️ No stored documents found - using default embedding provider")
+        logger.debug("No stored documents found - using default embedding provider")
         try:
-            result = await self.create_embeddings([text])
-            return result[0] if result else self._create_fallback_embedding(text)
+            result, provider = await self._create_embeddings_with_provider([text])
+            return self._first_embedding(result, text, provider)
         except Exception as e:
-            print(f"Default embedding failed: {e}")
-            return self._create_fallback_embedding(text)
+            logger.warning("Default embedding failed: %s", e)
+            return self._create_fallback_embedding(text), "fallback"
     
+    def _contained_base_words(self, text: str) -> List[str]:
+        """Base words occurring anywhere in text, in synonym-table order"""
+        found = set()
+        for match in _BASE_WORD_PATTERN.finditer(text):
+            found |= _BASE_WORD_CLOSURE[match.group(1)]
+        if not found:
+            return []
+        return [word for word in _TURKISH_SYNONYMS if word in found]
+
+    def _match_word_synonyms(self, word: str) -> List[str]:
+        """Collect the top synonyms of every base word contained in word"""
+        matched = []
+        for base_word in self._contained_base_words(word):
+            matched.extend(_TURKISH_SYNONYMS[base_word][:2])  # Add top 2 synonyms
+        return matched
+
+    def _synonyms_for_word(self, word: str) -> List[str]:
+        """Single dict probe per word; unseen words are scanned once and memoized"""
+        syns = self._word_to_syns.get(word)
+        if syns is None:
+            syns = self._match_word_synonyms(word)
+            if len(self._word_to_syns) < _WORD_SYNONYM_CACHE_SIZE:
+                self._word_to_syns[word] = syns
+        return syns
+
     def _expand_query(self, query: str) -> List[str]:
         """Expand query with synonyms for better semantic search"""
-        expanded_queries = [query.lower()]
+        lowered_query = query.lower()
+        expanded_queries = [lowered_query]
+        seen = {lowered_query}
         
         # Check for each synonym group
-        for base_word, synonyms in self.turkish_synonyms.items():
-            if base_word in query.lower():
-                # Add variations with synonyms
-                for synonym in synonyms:
-                    expanded_query = query.lower().replace(base_word, synonym)
-                    if expanded_query not in expanded_queries:
-                        expanded_queries.append(expanded_query)
+        for base_word in self._contained_base_words(lowered_query):
+            # Add variations with synonyms
+            for synonym in _TURKISH_SYNONYMS[base_word]:
+                expanded_query = lowered_query.replace(base_word, synonym)
+                if expanded_query not in seen:
+                    seen.add(expanded_query)
+                    expanded_queries.append(expanded_query)
         
         # Add combined query with all relevant synonyms
-        query_words = query.lower().split()
+        query_words = lowered_query.split()
         expanded_words = []
         
         for word in query_words:
             expanded_words.append(word)
             # Add synonyms for this word
-            for base_word, synonyms in self.turkish_synonyms.items():
-                if base_word in word:
-                    expanded_words.extend(synonyms[:2])  # Add top 2 synonyms
+            expanded_words.extend(self._synonyms_for_word(word))
         
         if len(expanded_words) > len(query_words):
             combined_query = ' '.join(expanded_words)
-            if combined_query not in expanded_queries:
+            if combined_query not in seen:
+                seen.add(combined_query)
                 expanded_queries.append(combined_query)
         
-        print(f"Query expansion: {len(expanded_queries)} variations")
-        for i, eq in enumerate(expanded_queries[:3]):  # Show top 3
-            print(f"   {i+1}. {eq}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Query expansion: %d variations", len(expanded_queries))
+            for i, eq in enumerate(expanded_queries[:3]):  # Show top 3
+                logger.debug("   %d. %s", i + 1, eq)
         
         return expanded_queries
 
@@ -496,6 +656,8 @@ class EmbeddingsService:
         if not text or len(text) <= chunk_size:
             return [text] if text else []
         
+        # Strip once up front; chunks only need re-stripping at whitespace edges
+        text = text.strip()
         chunks = []
         text_length = len(text)
         
@@ -504,6 +666,10 @@ class EmbeddingsService:
             chunk_size = 300
             overlap = 30
         
+        # Locate every sentence/paragraph boundary once instead of rfind-ing per chunk
+        punctuation_positions = [m.start() for m in _SENTENCE_END_PATTERN.finditer(text)]
+        paragraph_positions = [m.start() for m in _PARAGRAPH_BREAK_PATTERN.finditer(text)]
+        
         # Context7 Pattern: Simple and reliable chunking
         start = 0
         while start < text_length:
@@ -515,19 +681,24 @@ class EmbeddingsService:
                 # Look for sentence boundaries in the last 150 characters
                 boundary_search_start = max(start, end - 150)
                 
-                # Find the best sentence ending
+                # Find the best sentence ending: the last precomputed boundary
+                # that fits in the window and lies after start
                 best_boundary = -1
-                for boundary_char in ['.', '!', '?', '\n\n']:
-                    boundary_pos = text.rfind(boundary_char, boundary_search_start, end)
-                    if boundary_pos > start:  # Must be after start
-                        best_boundary = max(best_boundary, boundary_pos + 1)
+                for positions, width in ((punctuation_positions, 1), (paragraph_positions, 2)):
+                    idx = bisect_right(positions, end - width) - 1
+                    if idx >= 0:
+                        boundary_pos = positions[idx]
+                        if boundary_pos >= boundary_search_start and boundary_pos > start:  # Must be after start
+                            best_boundary = max(best_boundary, boundary_pos + 1)
                 
                 # Use boundary if found, otherwise use original end
                 if best_boundary > start:
                     end = best_boundary
             
             # Extract chunk with proper whitespace handling
-            chunk = text[start:end].strip()
+            chunk = text[start:end]
+            if chunk and (chunk[0].isspace() or chunk[-1].isspace()):
+                chunk = chunk.strip()
             if chunk and len(chunk) > 10:  # Skip tiny fragments
                 chunks.append(chunk)
             
@@ -544,7 +715,7 @@ class EmbeddingsService:
             if start >= text_length:
                 break
         
-        print(f"✅ Created {len(chunks)} clean chunks (no fragmentation)")
+        logger.debug("Created %d clean chunks", len(chunks))
         return chunks
 
 # Global embeddings service instance
@@ -3,6 +3,7 @@ Enterprise RAG System - Vector Store Service (Context7 Verified)
 Pinecone implementation with ChromaDB persistent fallback for document vector storage and retrieval
 """
 import asyncio
+import heapq
 from typing import List, Dict, Optional, Tuple, Union, Any
 import numpy as np
 import os
@@ -11,6 +12,9 @@ import uuid
 from datetime import datetime
 from app.services.embeddings import embeddings_service  # Import the embeddings service
 
+# Domain keywords that nudge ChromaDB hits up when present in content or source
+_BOOST_TERMS = ("bloke", "işlem", "güvenlik", "şifre", "kart")
+
 # Check if Pinecone is available
 try:
     from pinecone import Pinecone, ServerlessSpec, CloudProvider, AwsRegion, VectorType
@@ -35,6 +39,8 @@ class VectorStoreService:
         # In-memory fallback storage
         self.in_memory_vectors: List[Dict] = []
         self.use_memory_fallback = True
+        # Contiguous per-dimension matrices over in_memory_vectors, rebuilt lazily
+        self._memory_index: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
         
         # Pinecone initialization (optional)
         self.pc: Optional[Any] = None
@@ -162,6 +168,7 @@ class VectorStoreService:
                 
                 # Clear existing in-memory vectors
                 self.in_memory_vectors = []
+                self._invalidate_memory_index()
                 
                 # Load into in-memory storage
                 for i in range(len(ids)):
@@ -197,6 +204,101 @@ class VectorStoreService:
         except Exception as e:
             print(f"Error loading ChromaDB to memory: {e}")
 
+    def _upsert_chroma_batches(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict],
+        documents: List[str]
+    ) -> int:
+        """Upsert into ChromaDB using the client's maximum batch size; returns the number of batches"""
+        try:
+            batch_size = self.chroma_client.get_max_batch_size()
+        except Exception:
+            batch_size = 5000
+        
+        batch_count = 0
+        for i in range(0, len(ids), batch_size):
+            self.chroma_collection.upsert(
+                ids=ids[i:i + batch_size],
+                embeddings=embeddings[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size],
+                documents=documents[i:i + batch_size]
+            )
+            batch_count += 1
+        return batch_count
+
+    def _append_memory_vectors(self, documents: List[Dict]) -> None:
+        """Append documents to in-memory storage, keeping embeddings as plain lists"""
+        for doc in documents:
+            embedding = doc.get("embedding", [])
+            if hasattr(embedding, 'tolist'):
+                embedding = embedding.tolist()
+            elif not isinstance(embedding, list):
+                embedding = list(embedding)
+            
+            self.in_memory_vectors.append({
+                "id": doc.get("id", str(uuid.uuid4())),
+                "embedding": embedding,
+                "metadata": doc.get("metadata", {})
+            })
+        self._invalidate_memory_index()
+
+    def _invalidate_memory_index(self) -> None:
+        """Drop the search matrices; call after any change to in_memory_vectors"""
+        self._memory_index = None
+
+    def _get_memory_index(self) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Map embedding dimension -> (positions in in_memory_vectors, L2-normalized
+        float32 matrix). One matmul against a matrix replaces the per-vector
+        cosine_similarity loop; zero vectors stay zero and score 0.
+        """
+        if self._memory_index is None:
+            positions_by_dim: Dict[int, List[int]] = {}
+            for position, vector in enumerate(self.in_memory_vectors):
+                positions_by_dim.setdefault(len(vector["embedding"]), []).append(position)
+            
+            memory_index = {}
+            for dim, positions in positions_by_dim.items():
+                matrix = np.asarray(
+                    [self.in_memory_vectors[p]["embedding"] for p in positions], dtype=np.float32
+                )
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                np.divide(matrix, norms, out=matrix, where=norms > 0)
+                memory_index[dim] = (np.asarray(positions, dtype=np.intp), matrix)
+            self._memory_index = memory_index
+        return self._memory_index
+
+    def _score_memory_vectors(self, query_embedding: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine similarity of the query against every in-memory vector of the same dimension"""
+        empty_positions = np.empty(0, dtype=np.intp)
+        positions, matrix = self._get_memory_index().get(len(query_embedding), (empty_positions, None))
+        if matrix is None:
+            return empty_positions, np.empty(0, dtype=np.float32)
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return positions, np.zeros(len(positions), dtype=np.float32)
+        return positions, matrix @ (query / query_norm)
+
+    @staticmethod
+    def _top_k_indices(scores: np.ndarray, keep: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the top_k kept scores, best first; ties keep insertion order"""
+        candidates = np.flatnonzero(keep)
+        if top_k <= 0:
+            return candidates[:0]
+        if len(candidates) > top_k:
+            # Partial selection: everything above the k-th best score, then the
+            # earliest of the vectors tied with it (matches a stable full sort)
+            candidate_scores = scores[candidates]
+            kth_score = np.partition(candidate_scores, len(candidates) - top_k)[len(candidates) - top_k]
+            above = candidates[candidate_scores > kth_score]
+            tied = candidates[candidate_scores == kth_score][:top_k - len(above)]
+            candidates = np.sort(np.concatenate((above, tied)))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
         try:
@@ -290,47 +392,22 @@ class VectorStoreService:
                     metadatas.append(clean_metadata)
                     documents_text.append(content)
                 
-                # Upsert to ChromaDB in batches
-                batch_size = 100
-                for i in range(0, len(ids), batch_size):
-                    batch_ids = ids[i:i + batch_size]
-                    batch_embeddings = embeddings[i:i + batch_size]
-                    batch_metadatas = metadatas[i:i + batch_size]
-                    batch_documents = documents_text[i:i + batch_size]
-                    
-                    # Use asyncio.to_thread for sync operations (Context7 pattern)
-                    await asyncio.to_thread(
-                        self.chroma_collection.upsert,
-                        ids=batch_ids,
-                        embeddings=batch_embeddings,
-                        metadatas=batch_metadatas,
-                        documents=batch_documents
-                    )
-                    print(f"Upserted batch {i//batch_size + 1}: {len(batch_ids)} documents to ChromaDB")
+                # Upsert to ChromaDB in as few native calls as possible, all in one worker thread
+                # (Context7 pattern: asyncio.to_thread for sync operations)
+                batch_count = await asyncio.to_thread(
+                    self._upsert_chroma_batches,
+                    ids,
+                    np.asarray(embeddings, dtype=np.float32),
+                    metadatas,
+                    documents_text
+                )
+                print(f"Upserted {len(ids)} documents to ChromaDB in {batch_count} batch(es)")
                 
                 print(f"✅ Successfully upserted {len(documents)} documents to ChromaDB")
                 
                 # ALSO add to in-memory storage for fallback
                 print("📝 Also adding to in-memory storage for fallback...")
-                for doc in documents:
-                    doc_id = doc.get("id", str(uuid.uuid4()))
-                    embedding = doc.get("embedding", [])
-                    metadata = doc.get("metadata", {})
-                    
-                    # Convert numpy array to list if needed for consistency
-                    try:
-                        if hasattr(embedding, 'tolist') and callable(getattr(embedding, 'tolist', None)):
-                            embedding = embedding.tolist()
-                        elif not isinstance(embedding, list):
-                            embedding = list(embedding)
-                    except Exception:
-                        pass
-                    
-                    self.in_memory_vectors.append({
-                        "id": doc_id,
-                        "embedding": embedding,
-                        "metadata": metadata
-                    })
+                self._append_memory_vectors(documents)
                 
                 print(f"✅ Also stored {len(documents)} documents in memory (total: {len(self.in_memory_vectors)})")
                 return True
@@ -345,13 +422,7 @@ class VectorStoreService:
         
         # Final fallback to in-memory storage
         print("📝 Using in-memory storage fallback")
-        for doc in documents:
-            doc_id = doc.get("id", str(uuid.uuid4()))
-            self.in_memory_vectors.append({
-                "id": doc_id,
-                "embedding": doc.get("embedding", []),
-                "metadata": doc.get("metadata", {})
-            })
+        self._append_memory_vectors(documents)
         
         print(f"✅ Stored {len(documents)} documents in memory")
         return True
@@ -366,13 +437,7 @@ class VectorStoreService:
             if self.index is None:
                 print("❌ Pinecone index still not available, falling back to memory")
                 # Fall back to in-memory storage
-                for doc in documents:
-                    doc_id = doc.get("id", str(uuid.uuid4()))
-                    self.in_memory_vectors.append({
-                        "id": doc_id,
-                        "embedding": doc.get("embedding", []),
-                        "metadata": doc.get("metadata", {})
-                    })
+                self._append_memory_vectors(documents)
                 print(f"✅ Stored {len(documents)} documents in memory")
                 return True
             
@@ -419,6 +484,126 @@ class VectorStoreService:
             print(f"Error upserting documents: {str(e)}")
             return True  # Return success to avoid breaking the pipeline
     
+    def _chroma_results_to_docs(
+        self,
+        results: Any,
+        query_index: int,
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[Dict]:
+        """Boosted, thresholded top_k documents for one query of a ChromaDB query() result"""
+        # Process results with proper None checks (Context7 pattern)
+        similar_docs = []
+        if results and results.get("ids") and len(results["ids"]) > query_index and len(results["ids"][query_index]) > 0:
+            ids = results["ids"][query_index]
+            metadatas = results.get("metadatas", [])
+            documents = results.get("documents", [])
+            distances = results.get("distances", [])
+            
+            # Use proper None checks for Optional types (Context7 pattern) - avoid numpy array boolean ambiguity
+            metadatas_valid = metadatas and len(metadatas) > query_index and metadatas[query_index] is not None
+            documents_valid = documents and len(documents) > query_index and documents[query_index] is not None
+            distances_valid = distances and len(distances) > query_index and distances[query_index] is not None
+            
+            if metadatas_valid and documents_valid and distances_valid:
+                metadata_list = metadatas[query_index]
+                document_list = documents[query_index]
+                distance_list = distances[query_index]
+                
+                # Convert distances to similarities in one pass (ChromaDB uses cosine distance);
+                # hits without a distance count as distance 1.0
+                distance_array = np.ones(len(ids), dtype=np.float64)
+                distance_array[:len(distance_list)] = np.asarray(distance_list[:len(ids)], dtype=np.float64)
+                similarities = 1.0 - distance_array
+                
+                # ENHANCED FILTERING: Use lower threshold for better recall, then rank by relevance
+                min_similarity = max(0.15, similarity_threshold - 0.1)
+                for i in np.flatnonzero(similarities >= min_similarity):
+                    similarity = float(similarities[i])
+                    metadata = metadata_list[i] if i < len(metadata_list) else {}
+                    content = document_list[i] if i < len(document_list) else ""
+                    
+                    # Ensure metadata is not None (Context7 pattern)
+                    safe_metadata = metadata if metadata is not None else {}
+                    
+                    # RELEVANCE BOOST: Check if query terms appear in content for better ranking
+                    content_lower = content.lower()
+                    source_name = safe_metadata.get("source", "unknown").lower()
+                    
+                    # Simple keyword matching boost for Turkish documents
+                    relevance_boost = 0.0
+                    for term in _BOOST_TERMS:
+                        if term in content_lower or term in source_name:
+                            relevance_boost += 0.05
+                    
+                    final_score = min(1.0, similarity + relevance_boost)
+                    
+                    similar_docs.append({
+                        "id": ids[i],
+                        "content": content,
+                        "source": safe_metadata.get("source", "unknown"),
+                        "page": safe_metadata.get("page", "N/A"),
+                        "score": final_score,
+                        "metadata": {
+                            **safe_metadata,
+                            "content": content,
+                            "similarity": similarity,
+                            "relevance_boost": relevance_boost
+                        }
+                    })
+        
+        # Take top_k by boosted score
+        return heapq.nlargest(top_k, similar_docs, key=lambda x: x["score"])
+
+    @staticmethod
+    def _chroma_where_clause(filter_metadata: Optional[Dict]) -> Optional[Dict]:
+        """ChromaDB where clause for the metadata keys stored on every chunk"""
+        where_clause = {}
+        if filter_metadata:
+            for key, value in filter_metadata.items():
+                if key in ["source", "title", "category", "page"]:
+                    where_clause[key] = value
+        return where_clause if where_clause else None
+
+    async def _search_chroma_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        filter_metadata: Optional[Dict],
+        similarity_threshold: float
+    ) -> Optional[List[List[Dict]]]:
+        """
+        Run every query embedding through a single ChromaDB query() call.
+        Returns one result list per query, or None when the caller should fall
+        back to per-query search (no ChromaDB, dimension mismatch or query error).
+        """
+        if self.chroma_collection is None or not query_embeddings:
+            return None
+        
+        try:
+            doc_count = self.chroma_collection.count()
+            
+            # Same heuristic as search_similar_documents: 3072-dim (Gemini) queries go to memory
+            if doc_count > 3500 and any(len(query_embedding) == 3072 for query_embedding in query_embeddings):
+                return None
+            
+            print(f"🔍 Batched ChromaDB search: {len(query_embeddings)} queries over {doc_count} documents...")
+            results = await asyncio.to_thread(
+                self.chroma_collection.query,
+                query_embeddings=query_embeddings,
+                n_results=min(top_k * 3, 100),  # Get more results for better filtering
+                where=self._chroma_where_clause(filter_metadata),
+                include=["metadatas", "documents", "distances"]  # type: ignore
+            )
+            
+            return [
+                self._chroma_results_to_docs(results, query_index, top_k, similarity_threshold)
+                for query_index in range(len(query_embeddings))
+            ]
+        except Exception as e:
+            print(f"❌ Batched ChromaDB search failed, searching per query: {e}")
+            return None
+
     async def search_similar_documents_multi_query(
         self,
         query_embeddings: List[List[float]],
@@ -436,18 +621,27 @@ class VectorStoreService:
             similarity_threshold = settings.SIMILARITY_THRESHOLD
             
         all_results = {}  # Use dict to avoid duplicates by document ID
+        per_query_top_k = top_k * 2  # Get more results per query
+        variant_threshold = max(0.15, similarity_threshold - 0.1)  # Lower threshold for variants
         
         print(f"🔍 Multi-query search with {len(query_embeddings)} variations...")
         
-        for i, query_embedding in enumerate(query_embeddings):
-            print(f"   🔍 Query variation {i+1}...")
-            results = await self.search_similar_documents(
-                query_embedding=query_embedding,
-                top_k=top_k * 2,  # Get more results per query
-                filter_metadata=filter_metadata,
-                similarity_threshold=max(0.15, similarity_threshold - 0.1)  # Lower threshold for variants
-            )
-            
+        # One native ChromaDB call for all variations; per-query search otherwise
+        per_query_results = await self._search_chroma_batch(
+            query_embeddings, per_query_top_k, filter_metadata, variant_threshold
+        )
+        if per_query_results is None:
+            per_query_results = []
+            for i, query_embedding in enumerate(query_embeddings):
+                print(f"   🔍 Query variation {i+1}...")
+                per_query_results.append(await self.search_similar_documents(
+                    query_embedding=query_embedding,
+                    top_k=per_query_top_k,
+                    filter_metadata=filter_metadata,
+                    similarity_threshold=variant_threshold
+                ))
+        
+        for results in per_query_results:
             # Merge results with score boosting for multiple matches
             for result in results:
                 doc_id = result["id"]
@@ -510,82 +704,15 @@ class VectorStoreService:
                     print(f"🔄 Using memory fallback for dimension compatibility...")
                     raise Exception("Dimension compatibility: Using memory fallback")
                 
-                # Build where clause for filtering
-                where_clause = {}
-                if filter_metadata:
-                    for key, value in filter_metadata.items():
-                        if key in ["source", "title", "category", "page"]:
-                            where_clause[key] = value
-                
                 # CONTEXT7 VERIFIED: Proper ChromaDB query with robust error handling
                 results = self.chroma_collection.query(
                     query_embeddings=[query_embedding],  # ChromaDB handles numpy arrays properly
                     n_results=min(top_k * 3, 100),  # Get more results for better filtering
-                    where=where_clause if where_clause else None,
+                    where=self._chroma_where_clause(filter_metadata),
                     include=["metadatas", "documents", "distances"]  # type: ignore
                 )
                 
-                # Process results with proper None checks (Context7 pattern)
-                similar_docs = []
-                if results and results.get("ids") and results["ids"] and len(results["ids"]) > 0 and len(results["ids"][0]) > 0:
-                    ids = results["ids"][0]
-                    metadatas = results.get("metadatas", [])
-                    documents = results.get("documents", [])
-                    distances = results.get("distances", [])
-                    
-                    # Use proper None checks for Optional types (Context7 pattern) - avoid numpy array boolean ambiguity
-                    metadatas_valid = metadatas and len(metadatas) > 0 and metadatas[0] is not None
-                    documents_valid = documents and len(documents) > 0 and documents[0] is not None  
-                    distances_valid = distances and len(distances) > 0 and distances[0] is not None
-                    
-                    if metadatas_valid and documents_valid and distances_valid:
-                        metadata_list = metadatas[0]
-                        document_list = documents[0]
-                        distance_list = distances[0]
-                        
-                        for i in range(len(ids)):
-                            # Convert distance to similarity (ChromaDB uses cosine distance)
-                            distance = distance_list[i] if i < len(distance_list) else 1.0
-                            similarity = 1.0 - distance  # Convert distance to similarity
-                            
-                            # ENHANCED FILTERING: Use lower threshold for better recall, then rank by relevance
-                            if similarity >= max(0.15, similarity_threshold - 0.1):
-                                metadata = metadata_list[i] if i < len(metadata_list) else {}
-                                content = document_list[i] if i < len(document_list) else ""
-                                
-                                # Ensure metadata is not None (Context7 pattern)
-                                safe_metadata = metadata if metadata is not None else {}
-                                
-                                # RELEVANCE BOOST: Check if query terms appear in content for better ranking
-                                content_lower = content.lower()
-                                source_name = safe_metadata.get("source", "unknown").lower()
-                                
-                                # Simple keyword matching boost for Turkish documents
-                                query_terms = ["bloke", "işlem", "güvenlik", "şifre", "kart"]
-                                relevance_boost = 0.0
-                                for term in query_terms:
-                                    if term in content_lower or term in source_name:
-                                        relevance_boost += 0.05
-                                
-                                final_score = min(1.0, similarity + relevance_boost)
-                                
-                                similar_docs.append({
-                                    "id": ids[i],
-                                    "content": content,
-                                    "source": safe_metadata.get("source", "unknown"),
-                                    "page": safe_metadata.get("page", "N/A"),
-                                    "score": final_score,
-                                    "metadata": {
-                                        **safe_metadata,
-                                        "content": content,
-                                        "similarity": similarity,
-                                        "relevance_boost": relevance_boost
-                                    }
-                                })
-                
-                # Sort by similarity and take top_k
-                similar_docs.sort(key=lambda x: x["score"], reverse=True)
-                similar_docs = similar_docs[:top_k]
+                similar_docs = self._chroma_results_to_docs(results, 0, top_k, similarity_threshold)
                 
                 print(f"✅ Found {len(similar_docs)} similar documents (threshold: {similarity_threshold:.2f})")
                 for i, doc in enumerate(similar_docs[:3]):
@@ -603,49 +730,40 @@ class VectorStoreService:
             print(f"🔍 Searching {len(self.in_memory_vectors)} documents in memory...")
             print(f"🎯 Query dimension: {len(query_embedding)}")
             
-            similar_docs = []
-            compatible_docs = 0
-            incompatible_docs = 0
+            # Only vectors with the query's dimension are comparable
+            positions, scores = self._score_memory_vectors(query_embedding)
+            compatible_docs = len(positions)
+            incompatible_docs = len(self.in_memory_vectors) - compatible_docs
             
-            for vector in self.in_memory_vectors:
-                vector_embedding = vector["embedding"]
-                
-                # Check dimension compatibility
-                if len(vector_embedding) != len(query_embedding):
-                    incompatible_docs += 1
-                    continue
-                
-                compatible_docs += 1
-                
-                # Apply metadata filtering
-                if filter_metadata:
-                    match = True
-                    for key, value in filter_metadata.items():
-                        if vector["metadata"].get(key) != value:
-                            match = False
-                            break
-                    if not match:
-                        continue
-                
-                # Calculate cosine similarity
-                similarity = self.cosine_similarity(query_embedding, vector_embedding)
-                
-                if similarity >= similarity_threshold:
-                    similar_docs.append({
-                        "id": vector["id"],
-                        "content": vector["metadata"].get("content", ""),
-                        "source": vector["metadata"].get("source", "unknown"),
-                        "page": vector["metadata"].get("page", "N/A"),
-                        "score": similarity,
-                        "metadata": {
-                            **vector["metadata"],
-                            "similarity": similarity
-                        }
-                    })
+            keep = scores >= similarity_threshold
+            
+            # Apply metadata filtering
+            if filter_metadata:
+                keep &= np.fromiter(
+                    (
+                        all(self.in_memory_vectors[p]["metadata"].get(key) == value for key, value in filter_metadata.items())
+                        for p in positions
+                    ),
+                    dtype=bool,
+                    count=len(positions)
+                )
             
-            # Sort by similarity and take top_k
-            similar_docs.sort(key=lambda x: x["score"], reverse=True)
-            similar_docs = similar_docs[:top_k]
+            # Result dicts are only built for the top_k winners
+            similar_docs = []
+            for i in self._top_k_indices(scores, keep, top_k):
+                vector = self.in_memory_vectors[positions[i]]
+                similarity = float(scores[i])
+                similar_docs.append({
+                    "id": vector["id"],
+                    "content": vector["metadata"].get("content", ""),
+                    "source": vector["metadata"].get("source", "unknown"),
+                    "page": vector["metadata"].get("page", "N/A"),
+                    "score": similarity,
+                    "metadata": {
+                        **vector["metadata"],
+                        "similarity": similarity
+                    }
+                })
             
             print(f"🔢 Dimension compatibility: {compatible_docs} compatible, {incompatible_docs} incompatible")
             print(f"✅ Found {len(similar_docs)} similar documents (threshold: {similarity_threshold:.2f})")
@@ -741,6 +859,7 @@ class VectorStoreService:
             # In-memory deletion
             initial_count = len(self.in_memory_vectors)
             self.in_memory_vectors = [v for v in self.in_memory_vectors if v["id"] not in document_ids]
+            self._invalidate_memory_index()
             deleted_count = initial_count - len(self.in_memory_vectors)
             print(f"Deleted {deleted_count} documents from memory")
             return True
@@ -826,6 +945,7 @@ class VectorStoreService:
                     v for v in self.in_memory_vectors 
                     if v.get("metadata", {}).get("source") != source_filename
                 ]
+                self._invalidate_memory_index()
                 memory_deleted = initial_count - len(self.in_memory_vectors)
                 if memory_deleted > 0:
                     print(f"🗑️ Deleted {memory_deleted} chunks from memory for {source_filename}")
@@ -1062,63 +1182,67 @@ class VectorStoreService:
             
             # SMART SOURCE FILTERING: Filter by query dimension AND preferred source
             query_dimension = len(query_embedding)
-            compatible_docs = []
+            positions, scores = self._score_memory_vectors(query_embedding)
+            sources = [self.in_memory_vectors[p]["metadata"].get("source", "unknown") for p in positions]
             source_stats = {}
             
             for doc in self.in_memory_vectors:
-                doc_dimension = len(doc["embedding"])
                 doc_source = doc["metadata"].get("source", "unknown")
                 
                 # Track source statistics
                 if doc_source not in source_stats:
                     source_stats[doc_source] = {"total": 0, "compatible": 0}
                 source_stats[doc_source]["total"] += 1
-                
-                if doc_dimension == query_dimension:
-                    compatible_docs.append(doc)
-                    source_stats[doc_source]["compatible"] += 1
+            for doc_source in sources:
+                source_stats[doc_source]["compatible"] += 1
             
             print(f"🎯 Query dimension: {query_dimension}")
             print(f"📊 Source statistics:")
             for source, stats in source_stats.items():
                 print(f"   📄 {source}: {stats['compatible']}/{stats['total']} compatible")
             
+            keep = np.ones(len(positions), dtype=bool)
+            
             # If preferred source specified and has compatible docs, filter by it
-            if preferred_source and any(doc["metadata"].get("source", "").startswith(preferred_source) 
-                                     for doc in compatible_docs):
-                filtered_docs = [doc for doc in compatible_docs 
-                               if doc["metadata"].get("source", "").startswith(preferred_source)]
-                print(f"🎯 Filtering by preferred source '{preferred_source}': {len(filtered_docs)} docs")
-                compatible_docs = filtered_docs
+            if preferred_source:
+                preferred = np.fromiter(
+                    (
+                        self.in_memory_vectors[p]["metadata"].get("source", "").startswith(preferred_source)
+                        for p in positions
+                    ),
+                    dtype=bool,
+                    count=len(positions)
+                )
+                if preferred.any():
+                    print(f"🎯 Filtering by preferred source '{preferred_source}': {int(preferred.sum())} docs")
+                    keep = preferred
             
-            if not compatible_docs:
+            if not keep.any():
                 print("⚠️ No compatible documents found!")
                 return []
             
-            # Calculate similarities
-            similarities = []
-            for doc in compatible_docs:
-                similarity = self.cosine_similarity(query_embedding, doc["embedding"])
-                similarities.append({
+            # Similarities come from one matmul; threshold masks replace the filtered lists
+            above_threshold = keep & (scores >= similarity_threshold)
+            
+            # Adaptive threshold
+            if np.count_nonzero(above_threshold) < 3 and similarity_threshold > 0.05:
+                adaptive_threshold = max(0.05, similarity_threshold - 0.1)
+                above_threshold = keep & (scores >= adaptive_threshold)
+                print(f"🔄 Adaptive threshold lowered to {adaptive_threshold:.2f}")
+            
+            # Result dicts are only built for the top_k winners
+            results = []
+            for i in self._top_k_indices(scores, above_threshold, top_k):
+                doc = self.in_memory_vectors[positions[i]]
+                results.append({
                     "id": doc["id"],
-                    "score": similarity,
+                    "score": float(scores[i]),
                     "metadata": doc["metadata"],
                     "content": doc["metadata"].get("content", ""),
                     "source": doc["metadata"].get("source", ""),
                     "page": doc["metadata"].get("page", 0)
                 })
             
-            # Sort and filter
-            similarities.sort(key=lambda x: x["score"], reverse=True)
-            filtered_results = [r for r in similarities if r["score"] >= similarity_threshold]
-            
-            # Adaptive threshold
-            if len(filtered_results) < 3 and similarity_threshold > 0.05:
-                adaptive_threshold = max(0.05, similarity_threshold - 0.1)
-                filtered_results = [r for r in similarities if r["score"] >= adaptive_threshold]
-                print(f"🔄 Adaptive threshold lowered to {adaptive_threshold:.2f}")
-            
-            results = filtered_results[:top_k]
             print(f"✅ Found {len(results)} similar documents from source filter")
             
             for i, result in enumerate(results):